@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import signal
+
+import run_pvz
+import weather_bot
+
+logger = logging.getLogger(__name__)
+
+async def start_app(app, webhook_url, webhook_listen, webhook_port, token) -> None:
+    # same order as Application.run_polling / run_webhook
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if webhook_url:
+        await app.updater.start_webhook(
+            listen=webhook_listen,
+            port=webhook_port,
+            url_path=token,
+            webhook_url=f'{webhook_url.rstrip("/")}/{token}'
+        )
+    else:
+        await app.updater.start_polling()
+    await app.start()
+
+async def stop_app(app) -> None:
+    # same order as Application.run_polling / run_webhook; each step runs even if
+    # an earlier one raised, so post_shutdown (e.g. the PvZ event watcher) always runs
+    try:
+        try:
+            if app.updater.running:
+                await app.updater.stop()
+        finally:
+            if app.running:
+                try:
+                    await app.stop()
+                finally:
+                    # post_stop only follows a stop() call
+                    if app.post_stop:
+                        await app.post_stop(app)
+    finally:
+        try:
+            await app.shutdown()
+        finally:
+            if app.post_shutdown:
+                await app.post_shutdown(app)
+
+async def run() -> None:
+    bots = [
+        (
+            weather_bot.build_weather_app(),
+            weather_bot.WEBHOOK_URL, weather_bot.WEBHOOK_LISTEN, weather_bot.WEBHOOK_PORT, weather_bot.TOKEN
+        ),
+    ]
+    # the PvZ bot is optional: it also needs a local Docker daemon
+    if run_pvz.PVZ_BOT_TOKEN:
+        bots.append((
+            run_pvz.build_pvz_app(),
+            run_pvz.PVZ_WEBHOOK_URL, run_pvz.PVZ_WEBHOOK_LISTEN, run_pvz.PVZ_WEBHOOK_PORT, run_pvz.PVZ_BOT_TOKEN
+        ))
+    else:
+        logger.info('PVZ_BOT_TOKEN is not set, running the weather bot only')
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        # let every start finish (or fail) before tearing anything down, so no app
+        # is stopped half-way through initializing or starting its updater
+        results = await asyncio.gather(*(start_app(*bot) for bot in bots), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        logger.info('%d bot(s) running...', len(bots))
+        await stop.wait()
+    finally:
+        await asyncio.gather(*(stop_app(app) for app, *_ in bots), return_exceptions=True)
+
+if __name__ == '__main__':
+    weather_bot.setup_logging()
+    asyncio.run(run())
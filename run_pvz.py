@@ -1,16 +1,57 @@
+import asyncio
+import atexit
 import docker
+import functools
 import webbrowser
 import logging
 import os
+import threading
+import time
+import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler
 
 # Constants
 PVZ_BOT_TOKEN = os.environ.get("PVZ_BOT_TOKEN")
+# webhook settings, see README.md
+PVZ_WEBHOOK_URL = os.environ.get("PVZ_WEBHOOK_URL")  # unset: poll instead
+PVZ_WEBHOOK_LISTEN = os.environ.get("PVZ_WEBHOOK_LISTEN", "127.0.0.1")
+PVZ_WEBHOOK_PORT = int(os.environ.get("PVZ_WEBHOOK_PORT", "8444"))
 BOT_NAME = '@run_pvz_locally_now_bot'
 PVZ_CONTAINER_NAME = 'pvzge'
 PVZ_IMAGE_NAME = 'gaozih/pvzge:latest'
 GOOGLE_CHROME_PATH = '/usr/bin/google-chrome'
+PVZ_URL = 'http://localhost:8080'
+# seconds, per Docker API request; stop() adds its grace period on top, and the
+# pull and events streams are requested without a timeout by docker-py itself
+DOCKER_TIMEOUT = 5
+DOCKER_POOL_SIZE = 20
+DOCKER_OP_TIMEOUT = 30  # seconds, for container start/stop
+DOCKER_PULL_TIMEOUT = 600  # seconds, image pulls can be slow
+DOCKER_RETRIES = 3
+EVENTS_RETRY_DELAY = 5  # seconds before resubscribing to Docker events
+EVENTS_MAX_RETRY_DELAY = 60  # seconds, cap for the resubscribe backoff
+DOCKER_PING_TTL = 5  # seconds a daemon health check result is reused
+
+# Docker event action -> resulting container status
+CONTAINER_EVENT_STATUS = {
+    'create': 'created',
+    'start': 'running',
+    'restart': 'running',
+    'unpause': 'running',
+    'pause': 'paused',
+    'die': 'exited',
+    'stop': 'exited',
+}
+
+DOCKER_UNAVAILABLE_TEXT = 'Docker is unavailable right now, please try again later.'
+START_TEXT = 'Hello! Use /run_pvz to start the Plants vs. Zombies game container.\nUse /stop_pvz to stop the container.'
+CREATE_PROMPT_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("Yes", callback_data='create_pvzge_container'),
+        InlineKeyboardButton("No", callback_data='no_action')
+    ]
+])
 
 # logger setup
 logging.basicConfig(
@@ -19,99 +60,220 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)    
 
-# Add token presence check (fail fast)
-if not PVZ_BOT_TOKEN:
-    logger.error("PVZ_BOT_TOKEN environment variable is not set.")
-    raise SystemExit("PVZ_BOT_TOKEN environment variable is required")
+# one client (and connection pool) for the lifetime of the bot, see _docker_client
+_DOCKER_CLIENT = None
+_DOCKER_CLIENT_LOCK = threading.Lock()
+
+def _docker_client() -> docker.DockerClient:
+    # called from handler worker threads and the event watcher, so creation is locked
+    global _DOCKER_CLIENT
+    with _DOCKER_CLIENT_LOCK:
+        if _DOCKER_CLIENT is None:
+            _DOCKER_CLIENT = docker.from_env(timeout=DOCKER_TIMEOUT, max_pool_size=DOCKER_POOL_SIZE)
+        return _DOCKER_CLIENT
+
+@atexit.register
+def _close_docker_client() -> None:
+    # only close a client that was actually created
+    with _DOCKER_CLIENT_LOCK:
+        if _DOCKER_CLIENT is not None:
+            _DOCKER_CLIENT.close()
 
-def open_local_browser(url: str) -> None:
+# last daemon health check, see _docker_ok
+_PING_STATE = {'ok': True, 'ts': float('-inf')}
+
+async def _docker_ok() -> bool:
+    # reuse a recent ping result so an outage doesn't cost a connect attempt per command
+    if time.monotonic() - _PING_STATE['ts'] < DOCKER_PING_TTL:
+        return _PING_STATE['ok']
     try:
-        webbrowser.get(GOOGLE_CHROME_PATH).open(url)
+        await asyncio.wait_for(asyncio.to_thread(lambda: _docker_client().ping()), timeout=DOCKER_TIMEOUT)
+        ok = True
     except Exception as e:
-        logger.debug('Could not open local browser at %s: %s', GOOGLE_CHROME_PATH, e)
+        logger.warning('Docker daemon is unavailable: %s', e)
+        ok = False
+    _PING_STATE.update(ok=ok, ts=time.monotonic())
+    return ok
 
-# command handler
+async def _run_docker(func, *args, timeout: float = DOCKER_OP_TIMEOUT):
+    # run a blocking docker-py call with a hard timeout, retrying transient socket errors.
+    # The timeout only stops us waiting: the worker thread can't be cancelled, so the call
+    # itself (e.g. a slow pull) keeps running in the background until Docker finishes it.
+    delay = 0.5
+    for attempt in range(1, DOCKER_RETRIES + 1):
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == DOCKER_RETRIES:
+                raise
+            logger.warning('Docker call %s failed (%s), retrying in %.1fs', func.__name__, e, delay)
+            await asyncio.sleep(delay)
+            delay *= 2
+
+async def _container_state(client: docker.DockerClient) -> dict:
+    # one inspect call gives the live State (Running, Status, ExitCode, ...) without building a Container
+    info = await _run_docker(client.api.inspect_container, PVZ_CONTAINER_NAME)
+    return info['State']
 
-async def status_pvzge_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    client = docker.from_env()
+def _watch_container_events(application, stop: threading.Event) -> None:
+    # Runs in its own thread and mirrors the container status into bot_data['pvz_status'].
+    # The entry only exists while the event stream is connected, so handlers can trust it.
+    bot_data = application.bot_data
+    delay = EVENTS_RETRY_DELAY
+    failing = False
+    while not stop.is_set():
+        try:
+            client = _docker_client()
+            events = client.events(decode=True, filters={'type': 'container', 'container': PVZ_CONTAINER_NAME})
+            bot_data['pvz_events'] = events
+            # post_shutdown may have run while we were subscribing and found nothing to close
+            if stop.is_set():
+                events.close()
+                break
+            # seed only after subscribing so no transition falls in between
+            try:
+                bot_data['pvz_status'] = client.api.inspect_container(PVZ_CONTAINER_NAME)['State']['Status']
+            except docker.errors.NotFound:
+                bot_data.pop('pvz_status', None)
+            if failing:
+                logger.info('Docker event stream reconnected')
+            delay = EVENTS_RETRY_DELAY
+            failing = False
+            for event in events:
+                action = event.get('Action', '')
+                if action == 'destroy':
+                    bot_data.pop('pvz_status', None)
+                elif action in CONTAINER_EVENT_STATUS:
+                    bot_data['pvz_status'] = CONTAINER_EVENT_STATUS[action]
+        except Exception as e:
+            if not stop.is_set():
+                # warn once per outage, then back off quietly
+                logger.log(logging.DEBUG if failing else logging.WARNING, 'Docker event stream failed: %s', e)
+                failing = True
+        finally:
+            bot_data.pop('pvz_status', None)
+            bot_data.pop('pvz_events', None)
+        stop.wait(delay)
+        delay = min(delay * 2, EVENTS_MAX_RETRY_DELAY)
+
+async def post_init(application) -> None:
+    stop = threading.Event()
+    application.bot_data['pvz_events_stop'] = stop
+    threading.Thread(
+        target=_watch_container_events, args=(application, stop), name='pvz-events', daemon=True
+    ).start()
+
+async def post_shutdown(application) -> None:
+    stop = application.bot_data.pop('pvz_events_stop', None)
+    if stop is not None:
+        stop.set()
+    events = application.bot_data.pop('pvz_events', None)
+    if events is not None:
+        # unblocks the watcher thread
+        events.close()
+
+# resolved once; None when Chrome isn't installed on this machine
+try:
+    _BROWSER = webbrowser.get(GOOGLE_CHROME_PATH)
+except webbrowser.Error:
+    _BROWSER = None
+
+async def open_local_browser(url: str) -> None:
+    if _BROWSER is None:
+        logger.debug('Could not open local browser: %s not found', GOOGLE_CHROME_PATH)
+        return
     try:
-        container = client.containers.get(PVZ_CONTAINER_NAME)
-        status = getattr(container, 'status', 'unknown')
-        await update.message.reply_text(f'The Plants vs. Zombies container status is: {status}.')
-    except docker.errors.NotFound:
-        keyboard = [
-            [
-                InlineKeyboardButton("Yes", callback_data='create_pvzge_container'),
-                InlineKeyboardButton("No", callback_data='no_action')
-            ]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text('PvZ container not found, create one?', reply_markup=markup)
-    except docker.errors.APIError as e:
-        logger.exception('Docker API error while checking container status')
-        await update.message.reply_text('A Docker API error occurred while trying to check the container status.')
+        # launching the browser spawns a process, keep it off the event loop
+        await asyncio.to_thread(_BROWSER.open, url)
     except Exception as e:
-        logger.exception('Error checking container status: %s', e)
-        await update.message.reply_text('An error occurred while trying to check the container status.')
+        logger.debug('Could not open local browser at %s: %s', GOOGLE_CHROME_PATH, e)
+
+# command handler
+
+def docker_handler(action: str):
+    # Shared Docker plumbing for the handlers below: daemon check, client and error replies.
+    # `action` finishes the sentence "... while trying to <action>."
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            # a connected event stream already proves the daemon is up
+            if 'pvz_events' not in context.application.bot_data and not await _docker_ok():
+                await update.message.reply_text(DOCKER_UNAVAILABLE_TEXT)
+                return
+            try:
+                client = await asyncio.to_thread(_docker_client)
+                await fn(update, context, client)
+            except docker.errors.NotFound:
+                await update.message.reply_text('The Plants vs. Zombies container was not found.')
+            except docker.errors.APIError:
+                logger.exception('Docker API error while trying to %s', action)
+                await update.message.reply_text(f'A Docker API error occurred while trying to {action}.')
+            except asyncio.TimeoutError:
+                # see _run_docker: Docker may still complete the operation
+                logger.warning('Timed out waiting for Docker to %s', action)
+                await update.message.reply_text(f'Timed out waiting for Docker to {action}, it may still be in progress.')
+            except Exception as e:
+                logger.exception('Error while trying to %s: %s', action, e)
+                await update.message.reply_text(f'An error occurred while trying to {action}.')
+        return wrapper
+    return decorator
+
+@docker_handler('check the container status')
+async def status_pvzge_command(update: Update, context: ContextTypes.DEFAULT_TYPE, client: docker.DockerClient) -> None:
+    status = context.application.bot_data.get('pvz_status')
+    if status is None:
+        try:
+            state = await _container_state(client)
+        except docker.errors.NotFound:
+            await update.message.reply_text('PvZ container not found, create one?', reply_markup=CREATE_PROMPT_MARKUP)
+            return
+        status = state.get('Status', 'unknown')
+    await update.message.reply_text(f'The Plants vs. Zombies container status is: {status}.')
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.message.reply_text('Hello! Use /run_pvz to start the Plants vs. Zombies game container.\nUse /stop_pvz to stop the container.')
+    await update.message.reply_text(START_TEXT)
 
-async def run_pvz_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    client = docker.from_env()
-    try:
-        container = client.containers.get(PVZ_CONTAINER_NAME)
-        if getattr(container, 'status', None) == 'running':
-            await update.message.reply_text('The Plants vs. Zombies container is already running, opening in browser...')
-            open_local_browser('http://localhost:8080')
-        else:
-            container.start()
-            await update.message.reply_text('The Plants vs. Zombies container has been started.')
-            open_local_browser('http://localhost:8080')
-    except docker.errors.NotFound:
-        await update.message.reply_text('The Plants vs. Zombies container was not found.')
-    except docker.errors.APIError as e:
-        logger.exception('Docker API error while starting container')
-        await update.message.reply_text('A Docker API error occurred while trying to start the container.')
-    except Exception as e:
-        logger.exception('Error starting container: %s', e)
-        await update.message.reply_text('An error occurred while trying to start the container.')
+@docker_handler('start the container')
+async def run_pvz_command(update: Update, context: ContextTypes.DEFAULT_TYPE, client: docker.DockerClient) -> None:
+    status = context.application.bot_data.get('pvz_status')
+    if status is None:
+        # Status, not Running: State.Running is also true for a paused container
+        status = (await _container_state(client))['Status']
+    if status == 'running':
+        await update.message.reply_text('The Plants vs. Zombies container is already running, opening in browser...')
+    elif status == 'paused':
+        await _run_docker(client.api.unpause, PVZ_CONTAINER_NAME)
+        await update.message.reply_text('The Plants vs. Zombies container has been resumed.')
+    else:
+        await _run_docker(client.api.start, PVZ_CONTAINER_NAME)
+        await update.message.reply_text('The Plants vs. Zombies container has been started.')
+    await open_local_browser(PVZ_URL)
 
-async def stop_pvz_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    client = docker.from_env()
-    try:
-        container = client.containers.get(PVZ_CONTAINER_NAME)
-        if getattr(container, 'status', None) == 'exited':
-            await update.message.reply_text('The Plants vs. Zombies container is already stopped.')
-        else:
-            container.stop()
-            await update.message.reply_text('The Plants vs. Zombies container has been stopped.')
-    except docker.errors.NotFound:
-        await update.message.reply_text('The Plants vs. Zombies container was not found.')
-    except docker.errors.APIError as e:
-        logger.exception('Docker API error while stopping container')
-        await update.message.reply_text('A Docker API error occurred while trying to stop the container.')
-    except Exception as e:
-        logger.exception('Error stopping container: %s', e)
-        await update.message.reply_text('An error occurred while trying to stop the container.')
+@docker_handler('stop the container')
+async def stop_pvz_command(update: Update, context: ContextTypes.DEFAULT_TYPE, client: docker.DockerClient) -> None:
+    stopped = context.application.bot_data.get('pvz_status') == 'exited'
+    if not stopped:
+        stopped = not (await _container_state(client))['Running']
+    if stopped:
+        await update.message.reply_text('The Plants vs. Zombies container is already stopped.')
+    else:
+        await _run_docker(client.api.stop, PVZ_CONTAINER_NAME)
+        await update.message.reply_text('The Plants vs. Zombies container has been stopped.')
 
-async def pull_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    client = docker.from_env()
+@docker_handler('pull the image')
+async def pull_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE, client: docker.DockerClient) -> None:
+    logger.info('Pulling PVZ image %s...', PVZ_IMAGE_NAME)
+    await update.message.reply_text(f'Pulling PVZ image {PVZ_IMAGE_NAME}...')
     try:
-        logger.info('Pulling PVZ image %s...', PVZ_IMAGE_NAME)
-        await update.message.reply_text(f'Pulling PVZ image {PVZ_IMAGE_NAME}...')
-        image = client.images.pull(PVZ_IMAGE_NAME)
-        logger.info('Successfully pulled PVZ image %s', PVZ_IMAGE_NAME)
-        await update.message.reply_text(f'Successfully pulled PVZ image {PVZ_IMAGE_NAME}.')
-    except docker.errors.APIError as e:
-        logger.exception('Docker API error while pulling image')
-        await update.message.reply_text('A Docker API error occurred while trying to pull the image.')
-    except Exception as e:
-        logger.exception('Error pulling image: %s', e)
-        await update.message.reply_text('An error occurred while trying to pull the image.')
+        await _run_docker(client.images.pull, PVZ_IMAGE_NAME, timeout=DOCKER_PULL_TIMEOUT)
+    except docker.errors.NotFound:
+        await update.message.reply_text(f'PVZ image {PVZ_IMAGE_NAME} was not found.')
+        return
+    logger.info('Successfully pulled PVZ image %s', PVZ_IMAGE_NAME)
+    await update.message.reply_text(f'Successfully pulled PVZ image {PVZ_IMAGE_NAME}.')
 
-if __name__ == '__main__':
-    app = ApplicationBuilder().token(PVZ_BOT_TOKEN).build()
+def build_pvz_app() -> Application:
+    app = ApplicationBuilder().token(PVZ_BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
 
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("status_pvzge", status_pvzge_command))
@@ -119,5 +281,23 @@ if __name__ == '__main__':
     app.add_handler(CommandHandler("stop_pvz", stop_pvz_command))
     app.add_handler(CommandHandler("pull_pvz_image", pull_image_command))
 
+    return app
+
+if __name__ == '__main__':
+    # Add token presence check (fail fast)
+    if not PVZ_BOT_TOKEN:
+        logger.error("PVZ_BOT_TOKEN environment variable is not set.")
+        raise SystemExit("PVZ_BOT_TOKEN environment variable is required")
+
+    app = build_pvz_app()
+
     logger.info("Bot is starting...")
-    app.run_polling()
\ No newline at end of file
+    if PVZ_WEBHOOK_URL:
+        app.run_webhook(
+            listen=PVZ_WEBHOOK_LISTEN,
+            port=PVZ_WEBHOOK_PORT,
+            url_path=PVZ_BOT_TOKEN,
+            webhook_url=f'{PVZ_WEBHOOK_URL.rstrip("/")}/{PVZ_BOT_TOKEN}'
+        )
+    else:
+        app.run_polling()
\ No newline at end of file
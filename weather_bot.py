@@ -2,30 +2,91 @@ from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 from typing import final
 import aiohttp
+import asyncio
+import atexit
 import logging
+import logging.handlers
+import orjson
 import psutil
+import queue
 import os
+import re
+import yarl
 from datetime import datetime
 
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+def setup_logging() -> None:
+    # Records are written to stderr by a background thread so handlers never block
+    # the event loop on console I/O. Replaces any root config set up at import time.
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logging.basicConfig(
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+        level=logging.INFO,
+        force=True
+    )
+
 # constants
 TOKEN: final = os.getenv('TOKEN')
 BOT_NAME: final = '@OrdinaryWeather_bot'
+HELLO_RE: final = re.compile(r'hello', re.IGNORECASE)
+START_TEXT: final = 'Check, check... it worked?'
+HELP_TEXT: final = 'To get the weather, use the command:\n/weather <city>'
 
 OPENWEATHER_API_KEY: final = os.getenv('OPENWEATHER_API_KEY')
+# webhook settings, see README.md
+WEBHOOK_URL: final = os.getenv('WEBHOOK_URL')  # unset: poll instead
+WEBHOOK_LISTEN: final = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT: final = int(os.getenv('WEBHOOK_PORT', '8443'))
+CPU_SAMPLE_INTERVAL: final = 2  # seconds
+
+# the city is added per request with update_query, which also URL-encodes it
+WEATHER_URL: final = yarl.URL('http://api.openweathermap.org/data/2.5/weather').with_query(
+    {'appid': OPENWEATHER_API_KEY or '', 'units': 'metric'}
+)
+
+# boot time never changes while we run
+BOOT_TIME_HUMAN_READABLE: final = datetime.fromtimestamp(psutil.boot_time()).strftime("%Y-%m-%d %H:%M:%S")
+
+# latest CPU sample, refreshed in the background by _cpu_sampler; None until the first one
+_STATE = {'cpu': None}
+
+async def _cpu_sampler() -> None:
+    while True:
+        await asyncio.sleep(CPU_SAMPLE_INTERVAL)
+        _STATE['cpu'] = psutil.cpu_percent(interval=None)
+
+# lifecycle hooks
+async def post_init(application: Application) -> None:
+    # one pooled session for every /weather call
+    application.bot_data['http'] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60)
+    )
+    # first call only primes psutil's counters and always returns 0.0
+    psutil.cpu_percent(interval=None)
+    application.bot_data['cpu_sampler'] = asyncio.create_task(_cpu_sampler())
+
+async def post_shutdown(application: Application) -> None:
+    sampler = application.bot_data.pop('cpu_sampler', None)
+    if sampler is not None:
+        sampler.cancel()
+
+    session = application.bot_data.pop('http', None)
+    if session is not None:
+        await session.close()
 
 # commands
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text('Check, check... it worked?')
+    await update.message.reply_text(START_TEXT)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text('To get the weather, use the command:\n/weather <city>')
+    await update.message.reply_text(HELP_TEXT)
 
 async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
@@ -33,65 +94,62 @@ async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     city = " ".join(context.args).strip()
 
-    url = f'http://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric'
+    url = WEATHER_URL.update_query(q=city)
+
+    session: aiohttp.ClientSession = context.application.bot_data['http']
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status == 404:
-                    await update.message.reply_text(f"City '{city}' not found.")
-                    return
-                elif resp.status != 200:
-                    await update.message.reply_text("Error fetching weather data. Please try again later.")
-                    return
-                
-                data = await resp.json()
-                main_data = data.get('main', {})
-                weather_data = data.get('weather', [{}])[0]
-                wind_data = data.get('wind', {})
-
-                temperature = main_data.get('temp', 'N/A')
-                feels_like = main_data.get('feels_like', 'N/A')
-                description = weather_data.get('description', 'No description available')
-                wind_speed = wind_data.get('speed', 'N/A')
-
-                reply_text = (
-                    f"Weather in {city}:\n"
-                    f"{description.capitalize()}\n"
-                    f"Temperature: {temperature}°C\n"
-                    f"Feels like: {feels_like}°C\n"
-                    f"Wind speed: {wind_speed} m/s"
-                )
-                await update.message.reply_text(reply_text)
+        async with session.get(url) as resp:
+            if resp.status == 404:
+                await update.message.reply_text(f"City '{city}' not found.")
+                return
+            elif resp.status != 200:
+                await update.message.reply_text("Error fetching weather data. Please try again later.")
+                return
+
+            data = await resp.json(loads=orjson.loads)
+            main_data = data.get('main', {})
+            weather_data = data.get('weather', [{}])[0]
+            wind_data = data.get('wind', {})
+
+            temperature = main_data.get('temp', 'N/A')
+            feels_like = main_data.get('feels_like', 'N/A')
+            description = weather_data.get('description', 'No description available')
+            wind_speed = wind_data.get('speed', 'N/A')
+
+            reply_text = (
+                f"Weather in {city}:\n"
+                f"{description.capitalize()}\n"
+                f"Temperature: {temperature}°C\n"
+                f"Feels like: {feels_like}°C\n"
+                f"Wind speed: {wind_speed} m/s"
+            )
+            await update.message.reply_text(reply_text)
 
     except aiohttp.ClientError as e:
-        logger.error(f"HTTP error occurred: {e}")
+        logger.error("HTTP error occurred: %s", e)
         await update.message.reply_text("Error fetching weather data. Please try again later.")
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+        logger.error("An unexpected error occurred: %s", e)
         await update.message.reply_text("An unexpected error occurred. Please try again later.")
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    cpu_usage = psutil.cpu_percent(interval=1)
+    cpu_usage = 'N/A' if _STATE['cpu'] is None else f"{_STATE['cpu']}%"
     memory = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
-    boot_time = psutil.boot_time()
-    boot_time_human_readable = datetime.fromtimestamp(boot_time).strftime("%Y-%m-%d %H:%M:%S")
 
     reply_text = (
         f"System Status:\n"
-        f"CPU Usage: {cpu_usage}%\n"
+        f"CPU Usage: {cpu_usage}\n"
         f"Memory: {memory.percent}% used of {memory.total / (1024 ** 3):.2f} GB\n"
         f"Disk: {disk.percent}% used of {disk.total / (1024 ** 3):.2f} GB\n"
-        f"Boot Time: {boot_time_human_readable}\n"
+        f"Boot Time: {BOOT_TIME_HUMAN_READABLE}\n"
     )
     await update.message.reply_text(reply_text)
 
 # response handlers
 def response_handler(text: str) -> str:
-    processed: str = text.lower()
-
-    if 'hello' in processed:
+    if HELLO_RE.search(text):
         return 'Hey'
 
     return 'What?'
@@ -100,26 +158,26 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message_type: str = update.message.chat.type
     text: str = update.message.text
 
-    print(f'User ({update.message.chat.id}) in {message_type}: "{text}"')
+    logger.debug('User (%s) in %s: %r', update.message.chat.id, message_type, text)
 
     if message_type == 'group':
-        if BOT_NAME in text:
-            new_text: str = text.replace(BOT_NAME, '').strip()
-            response: str = response_handler(new_text)
-        else:
+        head, sep, tail = text.partition(BOT_NAME)
+        if not sep:
             return
+        new_text: str = (head + tail).strip()
+        response: str = response_handler(new_text)
     else:
         response: str = response_handler(text)
 
-    print('Bot', response)
+    logger.debug('Bot: %s', response)
     await update.message.reply_text(response)
 
 async def error(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    print(f'Update {update} caused error {context.error}')
+    logger.error('Update %s caused error %s', update, context.error, exc_info=context.error)
 
 
-if __name__ == '__main__':
-    app = Application.builder().token(TOKEN).build()
+def build_weather_app() -> Application:
+    app = Application.builder().token(TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
 
     # commands
     app.add_handler(CommandHandler('start', start_command))
@@ -133,6 +191,22 @@ if __name__ == '__main__':
     # Errors
     app.add_error_handler(error)
 
-    # polls the bot
-    print('Polling...')
-    app.run_polling(poll_interval=3)
\ No newline at end of file
+    return app
+
+
+if __name__ == '__main__':
+    setup_logging()
+    app = build_weather_app()
+
+    if WEBHOOK_URL:
+        logger.info('Listening for webhook updates...')
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=TOKEN,
+            webhook_url=f'{WEBHOOK_URL.rstrip("/")}/{TOKEN}'
+        )
+    else:
+        # polls the bot
+        logger.info('Polling...')
+        app.run_polling()
\ No newline at end of file